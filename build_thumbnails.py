@@ -0,0 +1,225 @@
+"""
+Offline job that generates resized thumbnails for the product images.
+
+Reads static/images/{id}.jpg and writes WebP and JPEG derivatives at a few
+widths to static/thumbs/, named {id}-{width}-{hash}.{ext} so they can be
+served with immutable caching. Widths larger than the source are skipped
+(a source narrower than every width gets one derivative at its own width).
+A manifest (static/thumbs/manifest.json) maps each item id to its
+derivatives and is loaded by RecommendationEngine.
+
+Only new or changed source images are processed on each run. Derivatives
+that drop out of the manifest are left on disk, because running servers
+still hand out URLs from the manifest they started with; remove them with
+--gc once every server has restarted.
+
+Usage:
+    python build_thumbnails.py [--widths 240 480] [--workers 4] [--force]
+    python build_thumbnails.py --gc [--gc-age-hours 24]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+from PIL import Image
+
+BASE_DIR = Path(__file__).parent
+SOURCE_DIR = BASE_DIR / "static" / "images"
+THUMB_DIR = BASE_DIR / "static" / "thumbs"
+MANIFEST_PATH = THUMB_DIR / "manifest.json"
+
+DEFAULT_WIDTHS = (240, 480)
+FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> dict:
+    if not path.is_file():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: Path = MANIFEST_PATH):
+    # Write to a temp file first so the server never sees a partial manifest
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp, path)
+
+
+def is_up_to_date(entry: dict, stat: os.stat_result, widths) -> bool:
+    """Cheap check on size/mtime and that every derivative is still on disk"""
+    if not entry:
+        return False
+    if entry.get("size") != stat.st_size or entry.get("mtime") != int(stat.st_mtime):
+        return False
+    return has_variants(entry, widths)
+
+
+def has_variants(entry: dict, widths) -> bool:
+    if entry.get("targets") != list(widths):
+        return False
+    variants = entry.get("variants", {})
+    for fmt in FORMATS:
+        files = variants.get(fmt, {})
+        if not files or not all((THUMB_DIR / name).is_file() for name in files.values()):
+            return False
+    return True
+
+
+def output_widths(src_w: int, widths) -> list:
+    """Requested widths the source can fill, or just its own width if none"""
+    return [w for w in widths if w <= src_w] or [src_w]
+
+
+def process_image(job):
+    """Create all derivatives of one source image, return (item_id, entry, error)"""
+    item_id, source, widths, old_entry = job
+
+    try:
+        stat = source.stat()
+        digest = file_hash(source)
+
+        # Touched but identical content: keep the existing files
+        if old_entry and old_entry.get("hash") == digest and has_variants(old_entry, widths):
+            return item_id, {**old_entry, "size": stat.st_size, "mtime": int(stat.st_mtime)}, None
+
+        with Image.open(source) as im:
+            im = im.convert("RGB")
+            src_w, src_h = im.size
+            variants = {fmt: {} for fmt in FORMATS}
+
+            for w in output_widths(src_w, widths):
+                h = max(1, round(src_h * w / src_w))
+                resized = im if w == src_w else im.resize((w, h), Image.LANCZOS)
+
+                for fmt, options in FORMATS.items():
+                    name = f"{item_id}-{w}-{digest}.{fmt if fmt != 'jpeg' else 'jpg'}"
+                    resized.save(THUMB_DIR / name, **options)
+                    variants[fmt][str(w)] = name
+
+    except Exception as e:
+        return item_id, None, f"{source.name}: {e}"
+
+    entry = {
+        "hash": digest,
+        "size": stat.st_size,
+        "mtime": int(stat.st_mtime),
+        "width": src_w,
+        "height": src_h,
+        "targets": list(widths),
+        "variants": variants,
+    }
+    return item_id, entry, None
+
+
+def referenced_files(manifest: dict) -> set:
+    return {
+        name
+        for entry in manifest.values()
+        for files in entry.get("variants", {}).values()
+        for name in files.values()
+    }
+
+
+def collect_garbage(min_age_hours: float = 24):
+    """
+    Delete derivatives the manifest no longer references, but only once the
+    manifest has been current for min_age_hours (servers started before it
+    was written may still hand out the old URLs)
+    """
+    if not MANIFEST_PATH.is_file():
+        print("No manifest, nothing to collect")
+        return 0
+
+    age_hours = (time.time() - MANIFEST_PATH.stat().st_mtime) / 3600
+    if age_hours < min_age_hours:
+        print(f"Manifest is only {age_hours:.1f}h old (< {min_age_hours}h), skipping")
+        return 0
+
+    keep = referenced_files(load_manifest())
+    removed = 0
+    for path in THUMB_DIR.iterdir():
+        if path.suffix in (".webp", ".jpg") and path.name not in keep:
+            path.unlink(missing_ok=True)
+            removed += 1
+    print(f"Removed {removed} unreferenced thumbnails")
+    return removed
+
+
+def build(widths=DEFAULT_WIDTHS, workers=None, force=False):
+    THUMB_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = {} if force else load_manifest()
+    widths = sorted(set(widths))
+
+    sources = {p.stem: p for p in SOURCE_DIR.glob("*.jpg")}
+    jobs = []
+    for item_id, source in sorted(sources.items()):
+        entry = manifest.get(item_id)
+        if is_up_to_date(entry, source.stat(), widths):
+            continue
+        jobs.append((item_id, source, widths, entry))
+
+    # Source images that were removed
+    removed = [item_id for item_id in manifest if item_id not in sources]
+
+    print(f"{len(sources)} source images, {len(jobs)} to process, {len(removed)} removed")
+
+    start = time.perf_counter()
+    errors = []
+    with Pool(processes=workers) as pool:
+        for item_id, entry, error in pool.imap_unordered(process_image, jobs, chunksize=16):
+            if error:
+                errors.append(error)
+                continue
+            manifest[item_id] = entry
+
+    # Old derivatives stay on disk until --gc (see module docstring)
+    for item_id in removed:
+        manifest.pop(item_id)
+
+    # Leave an unchanged manifest untouched so its mtime keeps meaning for --gc
+    if jobs or removed or force:
+        save_manifest(manifest)
+    elapsed = time.perf_counter() - start
+
+    print(f"Processed {len(jobs) - len(errors)} images in {elapsed:.1f}s")
+    for error in errors:
+        print(f"  failed: {error}", file=sys.stderr)
+
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate product image thumbnails")
+    parser.add_argument("--widths", type=int, nargs="+", default=list(DEFAULT_WIDTHS))
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true",
+                        help="ignore the existing manifest and rebuild everything")
+    parser.add_argument("--gc", action="store_true",
+                        help="delete thumbnails no longer in the manifest instead of building")
+    parser.add_argument("--gc-age-hours", type=float, default=24,
+                        help="only collect once the manifest is at least this old")
+    args = parser.parse_args()
+
+    if args.gc:
+        collect_garbage(args.gc_age_hours)
+    else:
+        build(widths=args.widths, workers=args.workers, force=args.force)
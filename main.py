@@ -1,20 +1,89 @@
 import os
 os.environ["TF_USE_LEGACY_KERAS"] = "1"
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g
 import sys
 import csv
+import json
+import hashlib
 from datetime import datetime
 import fetch_weather
-from model.build_model import RecommendationEngine
+from model.build_model import (
+    RecommendationEngine, preferred_article_type, U_gender, U_season, U_usage
+)
 from search_links import build_buy_links
+from request_log import RequestLogger, StageTimer, capture_inputs
 sys.stdout.reconfigure(line_buffering=True)
 
+try:
+    import orjson
+except ImportError:  # pinned in requirements.txt; stdlib json keeps dev setups working
+    orjson = None
+
 app = Flask(__name__)
 
 recommendation_engine = RecommendationEngine()
 recommendation_engine.load_model_and_index()
 
+# Thumbnails have content-hashed filenames, so they never change in place
+IMMUTABLE_STATIC_PREFIX = "/static/thumbs/"
+
+
+@app.after_request
+def add_static_cache_headers(response):
+    # 304s too: their headers replace the cached ones, and werkzeug's
+    # default "no-cache" would make the thumbnail revalidate on every use
+    if request.path.startswith(IMMUTABLE_STATIC_PREFIX) and response.status_code in (200, 206, 304):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+# Sampled capture of recommendation traffic for offline replay (see replay.py)
+CAPTURED_ENDPOINTS = {"recommend", "recommend_cached", "process_location"}
+
+request_logger = RequestLogger()
+request_logger.start()
+
+
+def mark_stage(stage: str):
+    timer = g.get("timer")
+    if timer is not None:
+        timer.mark(stage)
+
+
+@app.before_request
+def start_request_capture():
+    if request.endpoint in CAPTURED_ENDPOINTS and request_logger.sampled():
+        g.timer = StageTimer()
+
+
+@app.after_request
+def finish_request_capture(response):
+    timer = g.get("timer")
+    if timer is None:
+        return response
+
+    timer.mark("serialize")
+    if request.method == "GET":
+        inputs = request.args.to_dict()
+    else:
+        inputs = request.get_json(silent=True) or {}
+
+    try:
+        request_logger.log(
+            request.path,
+            capture_inputs(request.path, inputs),
+            response.status_code,
+            timer.total(),
+            method=request.method,
+            season=(g.get("user_inputs") or {}).get("season"),
+            # the inputs predict() actually ran with, so replay does the same work
+            query=g.get("user_inputs"),
+            k=g.get("k"),
+        )
+    except Exception as e:
+        print(f"Request capture failed: {str(e)}")
+    return response
+
 @app.route("/")
 def home():
     return render_template("home.html", title="Home", active_page="home")
@@ -74,6 +143,112 @@ def process_location():
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
 
+# Cache lifetime for GET /recommend responses (seconds)
+RECOMMEND_MAX_AGE = int(os.environ.get("RECOMMEND_MAX_AGE", 3600))
+
+
+def dumps_json(payload) -> bytes:
+    """Serialise a response payload as compact UTF-8 JSON (same bytes either way)"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def json_response(payload, status=200):
+    return app.response_class(dumps_json(payload), status=status, mimetype="application/json")
+
+
+def is_truthy(value) -> bool:
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Case-insensitive lookup onto the model vocabularies
+CANONICAL_VALUES = {
+    key: {str(v).lower(): str(v) for v in vocabulary}
+    for key, vocabulary in (('gender', U_gender), ('season', U_season), ('usage', U_usage))
+}
+
+
+def normalize_recommend_params(data) -> tuple[dict, int]:
+    """Return (user_inputs, k) in canonical form so equivalent queries share a cache key"""
+    def canonical(key, default):
+        value = " ".join(str(data.get(key) or default).split())
+        return CANONICAL_VALUES[key].get(value.lower(), value)
+
+    usage = canonical('usage', 'Casual')
+    user_inputs = {
+        'gender': canonical('gender', 'Men'),
+        # predict() derives the article type from usage, so the requested
+        # one is replaced rather than splitting the cache on it
+        'articleType': preferred_article_type(usage),
+        'season': canonical('season', 'Summer'),
+        'usage': usage
+    }
+
+    try:
+        k = int(data.get('k', 5))
+    except (TypeError, ValueError):
+        raise ValueError("Number of items (k) must be an integer")
+    if not (1 <= k <= 10):
+        raise ValueError("Number of items (k) must be between 1 and 10")
+
+    return user_inputs, k
+
+
+def recommend_etag(user_inputs: dict, k: int, compact: bool) -> str:
+    """Strong ETag for a recommendation query under the loaded artifacts"""
+    key = json.dumps(
+        [recommendation_engine.version, user_inputs, k, compact],
+        sort_keys=True
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def build_recommendations(user_inputs: dict, k: int, compact: bool) -> dict:
+    g.user_inputs, g.k = user_inputs, k
+    recommendations = recommendation_engine.predict(user_inputs, k=k, debug=not compact)
+    mark_stage("predict")
+
+    for it in recommendations:
+        it["buy_links"] = build_buy_links(it)
+    mark_stage("buy_links")
+
+    return {
+        'recommendations': recommendations,
+        'query': user_inputs
+    }
+
+
+@app.route('/recommend', methods=['GET'])
+def recommend_cached():
+    """Cacheable variant of /recommend keyed on the query string"""
+    try:
+        user_inputs, k = normalize_recommend_params(request.args)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    compact = is_truthy(request.args.get('compact', '0'))
+    etag = recommend_etag(user_inputs, k, compact)
+    g.user_inputs, g.k = user_inputs, k
+
+    # Results are deterministic for a given artifact version, so a matching
+    # ETag can be answered without running the model
+    # If-None-Match uses weak comparison (RFC 9110), so a W/ tag added by a
+    # compressing proxy still revalidates
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        try:
+            response = json_response(build_recommendations(user_inputs, k, compact))
+        except Exception as e:
+            print(f"Error in recommendation: {str(e)}")
+            return json_response({'error': f'Recommendation error: {str(e)}'}, 500)
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={RECOMMEND_MAX_AGE}'
+    return response
+
+
 @app.route('/recommend', methods=['POST'])
 def recommend():
     """Get product recommendations"""
@@ -89,15 +264,9 @@ def recommend():
         }
 
         # Get recommendations using the class
-        recommendations = recommendation_engine.predict(user_inputs)
-
-        for it in recommendations:
-            it["buy_links"] = build_buy_links(it)
+        payload = build_recommendations(user_inputs, 5, is_truthy(data.get('compact', False)))
 
-        return jsonify({
-            'recommendations': recommendations,
-            'query': user_inputs
-        }), 200
+        return json_response(payload, 200)
 
     except Exception as e:
         print(f"Error in recommendation: {str(e)}")
@@ -127,6 +296,7 @@ def process_data(data: dict):
 
     if not (today <= target_date <= today + timedelta(days=15)):
         raise ValueError("Target date must be within 15 days from today")
+    g.k = k
 
     # LOCATION
     location = data.get("location")
@@ -135,13 +305,16 @@ def process_data(data: dict):
 
     lat = location.get("lat")
     lng = location.get("lng")
+    mark_stage("validate")
 
     if not fetch_weather.is_on_land(lat, lng):
         raise ValueError("Selected location must be on land")
+    mark_stage("land_check")
 
     # WEATHER & RECOMMEND
     weather_data = fetch_weather.fetch_weather_data(lat, lng)
     season = fetch_weather.categorize_season(weather_data)
+    mark_stage("weather")
 
     user_inputs = {
         'gender': data['gender'],
@@ -149,10 +322,14 @@ def process_data(data: dict):
         'season': season,
         'usage': data['occasion'].capitalize()
     }
+    g.user_inputs = user_inputs
 
     recommendations = recommendation_engine.predict(user_inputs, k=k)
+    mark_stage("predict")
+
     for it in recommendations:
         it["buy_links"] = build_buy_links(it)
+    mark_stage("buy_links")
 
     return recommendations
 
@@ -2,6 +2,7 @@ import os
 os.environ["TF_USE_LEGACY_KERAS"] = "1"
 
 import json
+import hashlib
 import tensorflow as tf
 import tensorflow_recommenders as tfrs
 import numpy as np
@@ -23,6 +24,10 @@ CLOTHING_TYPES = {
 }
 
 DATA_PATH = Path(__file__).parent / "styles.csv"
+WEIGHT_PATH = Path(__file__).parent / "model.weights.h5"
+CANDIDATE_INDEX_PATH = Path(__file__).parent / "candidate_index.npz"
+IMAGE_DIR = Path(__file__).parent.parent / "static" / "images"
+THUMB_MANIFEST_PATH = Path(__file__).parent.parent / "static" / "thumbs" / "manifest.json"
 Columns = ['id', 'gender', 'articleType', 'season', 'usage']
 
 df = pd.read_csv(DATA_PATH, usecols=Columns)
@@ -175,11 +180,13 @@ class main_model(tfrs.Model):
         else:
             self.task = tfrs.tasks.Retrieval()
 
+    # Outputs are kept in float32 so the retrieval logits and loss are too
+    # when training under a mixed-precision policy (no-op otherwise)
     def compute_query_embeddings(self, features):
-        return self.query_model(features)
+        return tf.cast(self.query_model(features), tf.float32)
 
     def compute_candidate_embeddings(self, features):
-        return self.candidate_model(features)
+        return tf.cast(self.candidate_model(features), tf.float32)
 
     def call(self, features):
         query_embed = self.compute_query_embeddings(features)
@@ -191,12 +198,63 @@ class main_model(tfrs.Model):
         return self.task(query_embed, candidate_embed)
 
 
+def preferred_article_type(usage):
+    """articleType used in the query; predict() derives it from usage"""
+    return "Shirts" if usage == "Formal" else "Tshirts"
+
+
+def artifact_version(*paths):
+    """Short content hash of the files the index is built from"""
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def load_image_manifest(path):
+    """Map item id -> image fields from the manifest written by build_thumbnails.py"""
+    if not Path(path).is_file():
+        return {}
+
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    images = {}
+    for item_id, entry in manifest.items():
+        variants = entry.get("variants", {})
+        jpeg = variants.get("jpeg", {})
+        webp = variants.get("webp", {})
+        if not jpeg:
+            continue
+
+        def srcset(files):
+            return ", ".join(
+                f"/static/thumbs/{name} {width}w"
+                for width, name in sorted(files.items(), key=lambda x: int(x[0]))
+            )
+
+        smallest = min(jpeg, key=int)
+        images[item_id] = {
+            "image": f"/static/thumbs/{jpeg[smallest]}",
+            "srcset": srcset(jpeg),
+            "srcset_webp": srcset(webp),
+            "has_image": True,
+        }
+    return images
+
+
 class RecommendationEngine:
     def __init__(self):
         self.model = None
         self.index = None
         self.all_identifiers = None
         self.df = None
+        self.version = None
+        self.model_version = None
+        self.images = {}
+        self.source_images = set()
 
     def load_model_and_index(self):
         """Load model and build index once at startup"""
@@ -207,11 +265,19 @@ class RecommendationEngine:
             optimizer=tf.keras.optimizers.Adam()
         )
 
-        WEIGHT_PATH = Path(__file__).parent / "model.weights.h5"
         self.model.load_weights(WEIGHT_PATH)
 
         print("Model loaded successfully!")
 
+        # Version of the weights + catalogue (matches train.py's export), and
+        # of everything that ends up in a response, used to build HTTP ETags
+        self.model_version = artifact_version(WEIGHT_PATH, DATA_PATH)
+        response_artifacts = [WEIGHT_PATH, DATA_PATH]
+        if THUMB_MANIFEST_PATH.is_file():
+            response_artifacts.append(THUMB_MANIFEST_PATH)
+        self.version = artifact_version(*response_artifacts)
+        print(f"Artifact version: {self.version}")
+
         self.df = df.set_index("id")
 
         # safety filter (should be redundant but keeps system robust)
@@ -219,12 +285,32 @@ class RecommendationEngine:
 
         print(f"Metadata loaded: {len(self.df)} items")
 
+        self.images = load_image_manifest(THUMB_MANIFEST_PATH)
+        print(f"Thumbnails loaded: {len(self.images)} items")
+
+        self.source_images = (
+            {p.stem for p in IMAGE_DIR.glob("*.jpg")} if IMAGE_DIR.is_dir() else set()
+        )
+        print(f"Source images found: {len(self.source_images)} items")
+
         # Build the index once
         print("Building recommendation index...")
         self.index = tfrs.layers.factorized_top_k.BruteForce(
             self.model.compute_query_embeddings
         )
 
+        # Candidate embeddings exported by train.py for these exact artifacts
+        if CANDIDATE_INDEX_PATH.is_file():
+            exported = np.load(CANDIDATE_INDEX_PATH)
+            if str(exported["version"]) == self.model_version:
+                self.index.index(
+                    candidates=tf.constant(exported["embeddings"]),
+                    identifiers=tf.constant(exported["ids"])
+                )
+                print("Index loaded from exported candidate embeddings!")
+                return
+            print("Exported candidate embeddings are stale, rebuilding...")
+
         # Get candidate dataset
         candidate_dataset = tf.data.Dataset.from_tensor_slices(data_dict)
 
@@ -245,14 +331,15 @@ class RecommendationEngine:
 
         print("Index built successfully!")
 
-    def predict(self, user_inputs, k=5):
+    def predict(self, user_inputs, k=5, debug=True):
         """
         Return full recommendation info
+        (set debug=False to leave out the per-item score breakdown)
         """
         if self.model is None or self.index is None:
             raise RuntimeError("Model not loaded. Call load_model_and_index() first.")
         
-        preferred_type = "Shirts" if user_inputs["usage"] == "Formal" else "Tshirts"
+        preferred_type = preferred_article_type(user_inputs["usage"])
         # Build query
         user_query = {
             "gender": tf.constant([user_inputs['gender']]),
@@ -313,14 +400,23 @@ class RecommendationEngine:
                 "gender": meta["gender"],
                 "season": meta["season"],
                 "usage": meta["usage"],
-                "image": f"/static/images/{item_id}.jpg",
                 "score": round(final_score, 4),
-                "debug": {
+            }
+
+            # Precomputed thumbnail URLs, or the original photo path when
+            # no derivatives have been generated for this item
+            item.update(self.images.get(item_id) or {
+                "image": f"/static/images/{item_id}.jpg",
+                "srcset": "",
+                "srcset_webp": "",
+                "has_image": item_id in self.source_images,
+            })
+            if debug:
+                item["debug"] = {
                     "embedding": round(embedding_score, 4),
                     "usage_match": usage_match,
                     "season_match": season_match,
                 }
-            }
 
             # TIER 1: usage + season
             season_ok = meta["season"] in [expected_season, "All"]
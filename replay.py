@@ -0,0 +1,185 @@
+"""
+Replay captured traffic (see request_log.py) as a load generator.
+
+Each captured record is replayed with the normalised inputs the server
+passed to predict() (including the season chosen at the time), so no
+weather or geocoding calls are made and --engine does the same work as
+the server. Queries are sent either to a running server
+(GET /recommend) or straight to RecommendationEngine.predict().
+
+Usage:
+    python replay.py --target http://localhost:5000 --rate 50 --concurrency 8
+    python replay.py logs/requests-1234.jsonl --engine --concurrency 4 --limit 2000
+
+With --rate, latency is measured from each request's scheduled send time,
+so time spent queued behind busy workers counts (no coordinated omission).
+Without it, requests are sent back to back and latency is service time.
+"""
+import argparse
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import mean
+
+import requests
+
+from request_log import read_records, default_log_files
+
+
+def to_query(record: dict):
+    """Return (user_inputs, k) for a captured record, or None if it can't be replayed"""
+    # "query" holds the normalised inputs the server passed to predict(),
+    # so both modes do the same work the server did
+    query = record.get("query")
+    if not query or not query.get("season"):
+        return None
+
+    k = int(record.get("k") or (record.get("inputs") or {}).get("k") or 5)
+    return dict(query), k
+
+
+def load_queries(paths, limit=None):
+    queries = []
+    for record in read_records(paths):
+        if record.get("status", 200) >= 400:
+            continue
+        query = to_query(record)
+        if query is not None:
+            queries.append(query)
+    if limit:
+        # Cycle through the captured distribution to reach the requested count
+        queries = list(itertools.islice(itertools.cycle(queries), limit)) if queries else []
+    return queries
+
+
+def http_sender(target: str, compact: bool):
+    local = threading.local()
+
+    def send(user_inputs, k):
+        # One session per worker thread
+        s = getattr(local, "session", None)
+        if s is None:
+            s = local.session = requests.Session()
+        params = {**user_inputs, "k": k}
+        if compact:
+            params["compact"] = 1
+        r = s.get(f"{target.rstrip('/')}/recommend", params=params, timeout=30)
+        r.raise_for_status()
+
+    return send
+
+
+def engine_sender():
+    from model.build_model import RecommendationEngine
+
+    engine = RecommendationEngine()
+    engine.load_model_and_index()
+
+    def send(user_inputs, k):
+        engine.predict(user_inputs, k=k)
+
+    return send
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def run(queries, send, rate=0.0, concurrency=1, warmup=0):
+    """Send every query, pacing to `rate` req/s (0 = as fast as possible)"""
+    for user_inputs, k in queries[:warmup]:
+        send(user_inputs, k)
+    queries = queries[warmup:]
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def task(query, scheduled=None):
+        user_inputs, k = query
+        t0 = scheduled if scheduled is not None else time.perf_counter()
+        try:
+            send(user_inputs, k)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        elapsed = (time.perf_counter() - t0) * 1000
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    dispatched = start
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, query in enumerate(queries):
+            scheduled = None
+            if rate > 0:
+                # Open-loop schedule: request i is due at start + i / rate
+                scheduled = start + i / rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(task, query, scheduled)
+        dispatched = time.perf_counter()
+    wall = time.perf_counter() - start
+
+    return report(latencies, errors, wall, rate, len(queries), dispatched - start)
+
+
+def report(latencies, errors, wall, rate=0.0, sent=0, dispatch_seconds=0.0):
+    values = sorted(latencies)
+    stats = {
+        "requests": len(values) + len(errors),
+        "errors": len(errors),
+        "seconds": round(wall, 3),
+        "requested_rps": rate if rate > 0 else "unthrottled",
+        "offered_rps": round(sent / dispatch_seconds, 2) if dispatch_seconds > 0 else 0.0,
+        "throughput_rps": round(len(values) / wall, 2) if wall > 0 else 0.0,
+        "mean_ms": round(mean(values), 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 2),
+        "p90_ms": round(percentile(values, 90), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "max_ms": round(values[-1], 2) if values else 0.0,
+    }
+
+    print("\n===== Replay Results =====\n")
+    for key, value in stats.items():
+        print(f"  {key:<15} {value}")
+    if errors:
+        print(f"\n  first error: {errors[0]}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay captured recommendation traffic")
+    parser.add_argument("logs", nargs="*",
+                        help="capture files, rotated siblings are included "
+                             "(default: every logs/requests-*.jsonl)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--target", default="http://localhost:5000",
+                      help="base URL of a running server")
+    mode.add_argument("--engine", action="store_true",
+                      help="call RecommendationEngine in-process instead of HTTP")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="requests per second (0 = unthrottled)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=None,
+                        help="number of requests to send (cycles through the logs)")
+    parser.add_argument("--warmup", type=int, default=0,
+                        help="requests sent before measuring")
+    parser.add_argument("--compact", action="store_true",
+                        help="request compact responses (HTTP mode)")
+    args = parser.parse_args()
+
+    queries = load_queries(args.logs or default_log_files(), args.limit)
+    if not queries:
+        raise SystemExit("No replayable records found")
+    print(f"Loaded {len(queries)} queries")
+
+    send = engine_sender() if args.engine else http_sender(args.target, args.compact)
+    run(queries, send, rate=args.rate, concurrency=args.concurrency, warmup=args.warmup)
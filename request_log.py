@@ -0,0 +1,155 @@
+"""
+Sampled request capture for the recommendation endpoints.
+
+Records are written as one JSON object per line to a size-rotated file.
+Writing happens on a background thread (QueueHandler/QueueListener), so a
+request only pays for building the record and putting it on a queue.
+
+Only the fields replay needs are kept: exact coordinates, age and the
+target date are dropped or coarsened (see capture_inputs).
+
+Each process rotates its own file, so the default path includes the PID;
+several workers (e.g. gunicorn) sharing one path would race on rotation.
+
+Configuration (environment variables):
+    REQUEST_LOG_PATH         output file, "{pid}" is replaced by the process
+                             id (default: logs/requests-{pid}.jsonl)
+    REQUEST_LOG_SAMPLE       fraction of requests to record, 0..1 (default: 0.1)
+    REQUEST_LOG_MAX_BYTES    rotate after this many bytes (default: 10 MB)
+    REQUEST_LOG_BACKUPS      rotated files to keep (default: 5)
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+LOG_DIR = Path(__file__).parent / "logs"
+DEFAULT_PATH = LOG_DIR / "requests-{pid}.jsonl"
+DEFAULT_PATTERN = "requests-*.jsonl"
+
+RECOMMEND_FIELDS = ("gender", "articleType", "season", "usage", "k", "compact")
+LOCATION_FIELDS = ("gender", "occasion", "k")
+
+
+def capture_inputs(endpoint: str, data: dict) -> dict:
+    """Keep only what replay needs; coarsen personal fields"""
+    if endpoint != "/process-location":
+        return {key: data[key] for key in RECOMMEND_FIELDS if key in data}
+
+    inputs = {key: data[key] for key in LOCATION_FIELDS if key in data}
+
+    age = data.get("age")
+    if isinstance(age, (int, float)):
+        band = int(age) // 5 * 5
+        inputs["age_band"] = f"{band}-{band + 4}"
+
+    # ~10 km grid, enough to group traffic by region
+    location = data.get("location") or {}
+    try:
+        inputs["region"] = [round(float(location["lat"]), 1), round(float(location["lng"]), 1)]
+    except (KeyError, TypeError, ValueError):
+        pass
+
+    return inputs
+
+
+class RequestLogger:
+    def __init__(self, path=None, sample_rate=None, max_bytes=None, backups=None):
+        path = path or os.environ.get("REQUEST_LOG_PATH", str(DEFAULT_PATH))
+        self.path = Path(str(path).replace("{pid}", str(os.getpid())))
+        if sample_rate is None:
+            sample_rate = float(os.environ.get("REQUEST_LOG_SAMPLE", 0.1))
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.max_bytes = int(max_bytes or os.environ.get("REQUEST_LOG_MAX_BYTES", 10 * 1024 * 1024))
+        self.backups = int(backups or os.environ.get("REQUEST_LOG_BACKUPS", 5))
+
+        self.logger = None
+        self.listener = None
+
+    def start(self):
+        """Open the log file and start the writer thread (no-op when disabled)"""
+        if self.sample_rate <= 0 or self.listener is not None:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8"
+        )
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+
+        records = queue.SimpleQueue()
+        self.logger = logging.getLogger("smartfit.requests")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(QueueHandler(records))
+
+        self.listener = QueueListener(records, file_handler)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def sampled(self) -> bool:
+        """Decide up front whether this request is recorded"""
+        return self.listener is not None and random.random() < self.sample_rate
+
+    def log(self, endpoint: str, inputs: dict, status: int, timings: dict, **fields):
+        record = {
+            "ts": round(time.time(), 3),
+            "endpoint": endpoint,
+            "status": status,
+            "inputs": inputs,
+            **fields,
+            "latency_ms": {name: round(ms, 3) for name, ms in timings.items()},
+        }
+        self.logger.info(json.dumps(record, separators=(",", ":"), default=str))
+
+
+class StageTimer:
+    """Collects per-stage wall-clock durations in milliseconds"""
+
+    def __init__(self):
+        self.timings = {}
+        self._start = time.perf_counter()
+        self._last = self._start
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.timings[stage] = (now - self._last) * 1000
+        self._last = now
+
+    def total(self) -> dict:
+        return {**self.timings, "total": (time.perf_counter() - self._start) * 1000}
+
+
+def default_log_files():
+    """Current capture file of every process that wrote to LOG_DIR"""
+    return sorted(LOG_DIR.glob(DEFAULT_PATTERN))
+
+
+def read_records(paths):
+    """Yield records from capture files, oldest rotated file first"""
+    for path in paths:
+        path = Path(path)
+        files = sorted(
+            path.parent.glob(path.name + ".*"),
+            key=lambda p: int(p.suffix[1:]) if p.suffix[1:].isdigit() else 0,
+            reverse=True
+        )
+        files.append(path)
+        for file in files:
+            if not file.is_file():
+                continue
+            with open(file, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
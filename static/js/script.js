@@ -195,6 +195,24 @@ if (submitBtn) {
     });
 }
 
+/* Responsive thumbnail, falls back to the full image / placeholder */
+function renderImage(item) {
+    const placeholder = '/static/images/placeholder.jpg';
+    const fallback = `this.src='${placeholder}'`;
+    if (!item.has_image) {
+        return `<img src="${placeholder}" loading="lazy">`;
+    }
+    if (!item.srcset) {
+        return `<img src="${item.image}" loading="lazy" onerror="${fallback}">`;
+    }
+    const sizes = '(max-width: 600px) 50vw, 240px';
+    return `
+            <picture>
+                ${item.srcset_webp ? `<source type="image/webp" srcset="${item.srcset_webp}" sizes="${sizes}">` : ''}
+                <img src="${item.image}" srcset="${item.srcset}" sizes="${sizes}" loading="lazy" onerror="${fallback}">
+            </picture>`;
+}
+
 /* Render Result */
 function renderResult(list) {
     if (!Array.isArray(list)) return;
@@ -220,7 +238,7 @@ function renderResult(list) {
             buyBtns += '</div>';
         }
         card.innerHTML = `
-            <img src="${item.image}" onerror="this.src='/static/images/placeholder.jpg'">
+            ${renderImage(item)}
             <div class="reco-content">
                 <div class="reco-title">${item.type}</div>
                 <div class="reco-sub">${item.usage} · ${item.season}</div>
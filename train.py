@@ -0,0 +1,224 @@
+"""
+Train the two-tower model and export the serving artifacts in one step.
+
+Writes, under model/:
+    model.weights.h5        weights loaded by RecommendationEngine
+    U_json/U_*.json         vocabularies the lookup layers were built with
+    candidate_index.npz     precomputed candidate embeddings + ids, tagged with
+                            the artifact version so the server can skip
+                            re-embedding the catalogue at startup
+
+Usage:
+    python train.py --epochs 10 --batch-size 1024 --seed 42
+    python train.py --epochs 5 --mixed-precision     # bfloat16 on CPU
+"""
+import os
+os.environ["TF_USE_LEGACY_KERAS"] = "1"
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+from model import build_model
+from model.build_model import (
+    main_model, data_dict, artifact_version,
+    U_gender, U_usage, U_type, U_season, U_id,
+    WEIGHT_PATH, DATA_PATH, CANDIDATE_INDEX_PATH,
+)
+
+VOCAB_DIR = Path(build_model.__file__).parent / "U_json"
+FEATURES = ["id", "gender", "articleType", "season", "usage"]
+
+
+def eval_sample(n: int, eval_size: int, seed: int):
+    """
+    Fixed-seed sample of catalogue rows for recall@k. Every row is still
+    trained on (each item's id embedding must be learned for serving), so
+    this is an in-sample measure, as FactorizedTopK over the training data was
+    """
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(n, size=min(eval_size, n), replace=False))
+
+
+def make_train_dataset(rows, batch_size: int, seed: int):
+    features = {name: data_dict[name][rows] for name in FEATURES}
+    return (
+        tf.data.Dataset.from_tensor_slices(features)
+        .cache()
+        .shuffle(len(rows), seed=seed, reshuffle_each_iteration=True)
+        .batch(batch_size)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+
+
+def candidate_matrix(model, batch_size: int = 4096):
+    """Embed the whole catalogue once, in row order of data_dict"""
+    n = len(data_dict["id"])
+    chunks = []
+    for start in range(0, n, batch_size):
+        features = {name: tf.constant(data_dict[name][start:start + batch_size]) for name in FEATURES}
+        chunks.append(tf.cast(model.candidate_model(features), tf.float32))
+    return tf.concat(chunks, axis=0)
+
+
+def recall_at_k(model, rows, ks=(10, 50, 100), batch_size: int = 512):
+    """
+    Recall@k of each row's own item among all candidates, using one
+    precomputed candidate matrix instead of re-embedding per batch
+    """
+    candidates = candidate_matrix(model)
+    max_k = min(max(ks), candidates.shape[0])
+    hits = {k: 0 for k in ks}
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        features = {name: tf.constant(data_dict[name][batch]) for name in FEATURES}
+        queries = tf.cast(model.query_model(features), tf.float32)
+
+        scores = tf.matmul(queries, candidates, transpose_b=True)
+        _, top = tf.math.top_k(scores, k=max_k)
+        top = top.numpy()
+
+        for k in ks:
+            hits[k] += int((top[:, :k] == batch[:, None]).any(axis=1).sum())
+
+    return {f"recall@{k}": hits[k] / max(len(rows), 1) for k in ks}
+
+
+class EpochReport(tf.keras.callbacks.Callback):
+    """Prints wall-clock, examples/s and (optionally) recall@k per epoch"""
+
+    def __init__(self, n_examples: int, eval_rows, eval_every: int):
+        super().__init__()
+        self.n_examples = n_examples
+        self.eval_rows = eval_rows
+        self.eval_every = eval_every
+        self._start = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._start
+        line = (
+            f"epoch {epoch + 1}: loss={logs.get('loss', float('nan')):.4f} "
+            f"time={elapsed:.1f}s examples/s={self.n_examples / elapsed:,.0f}"
+        )
+
+        if self.eval_every and (epoch + 1) % self.eval_every == 0 and len(self.eval_rows):
+            t0 = time.perf_counter()
+            metrics = recall_at_k(self.model, self.eval_rows)
+            line += " " + " ".join(f"{k}={v:.4f}" for k, v in metrics.items())
+            line += f" eval={time.perf_counter() - t0:.1f}s"
+
+        print(line)
+
+
+def export_vocabularies():
+    VOCAB_DIR.mkdir(parents=True, exist_ok=True)
+    vocabularies = {
+        "U_gender": U_gender, "U_usage": U_usage, "U_type": U_type,
+        "U_season": U_season, "U_id": U_id,
+    }
+    for name, values in vocabularies.items():
+        path = VOCAB_DIR / f"{name}.json"
+
+        # Keep each file's existing layout (single-line or indented)
+        indent = None
+        if path.is_file():
+            with open(path, encoding="utf-8") as f:
+                if f.read(2) == "[\n":
+                    indent = 4
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([str(v) for v in values], f, indent=indent, ensure_ascii=False)
+
+
+def float32_model():
+    """Fresh float32 copy of the exported weights, as RecommendationEngine loads them"""
+    tf.keras.mixed_precision.set_global_policy("float32")
+    model = main_model(with_metrics=False)
+    model.compile(optimizer=tf.keras.optimizers.Adam())
+    model.load_weights(WEIGHT_PATH)
+    return model
+
+
+def export_candidate_index(model, version: str):
+    embeddings = candidate_matrix(model).numpy().astype(np.float32)
+    ids = np.asarray(data_dict["id"]).astype(str)
+    np.savez(CANDIDATE_INDEX_PATH, ids=ids, embeddings=embeddings, version=np.array(version))
+
+
+def train(epochs=10, batch_size=1024, learning_rate=0.001, seed=42,
+          eval_size=2000, eval_every=1, mixed_precision=False, deterministic=False):
+    tf.keras.utils.set_random_seed(seed)
+    if deterministic:
+        tf.config.experimental.enable_op_determinism()
+    if mixed_precision:
+        # bfloat16 is the mixed-precision type with fast kernels on CPU
+        tf.keras.mixed_precision.set_global_policy("mixed_bfloat16")
+
+    train_rows = np.arange(len(data_dict["id"]))
+    eval_rows = eval_sample(len(train_rows), eval_size, seed)
+    train_ds = make_train_dataset(train_rows, batch_size, seed)
+    print(f"Training on {len(train_rows)} items, evaluating recall on {len(eval_rows)} of them")
+
+    model = main_model(with_metrics=False)
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate))
+
+    start = time.perf_counter()
+    model.fit(
+        train_ds,
+        epochs=epochs,
+        verbose=0,
+        callbacks=[EpochReport(len(train_rows), eval_rows, eval_every)]
+    )
+    print(f"Training finished in {time.perf_counter() - start:.1f}s")
+
+    if len(eval_rows):
+        metrics = recall_at_k(model, eval_rows)
+        print("Final " + " ".join(f"{k}={v:.4f}" for k, v in metrics.items()))
+
+    # EXPORT
+    model.save_weights(WEIGHT_PATH)
+    export_vocabularies()
+    version = artifact_version(WEIGHT_PATH, DATA_PATH)
+
+    # The server embeds in float32; bf16 candidates would not match it
+    export_model = float32_model() if mixed_precision else model
+    export_candidate_index(export_model, version)
+    print(f"Exported artifacts (version {version}) to {WEIGHT_PATH.parent}")
+
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the SmartFit two-tower model")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--learning-rate", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--eval-size", type=int, default=2000,
+                        help="catalogue rows sampled for in-sample recall@k (0 disables)")
+    parser.add_argument("--eval-every", type=int, default=1,
+                        help="compute recall@k every N epochs (0 = only at the end)")
+    parser.add_argument("--mixed-precision", action="store_true",
+                        help="train with the mixed_bfloat16 policy")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="enable deterministic TF ops (slower, bit-reproducible)")
+    args = parser.parse_args()
+
+    train(
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        learning_rate=args.learning_rate,
+        seed=args.seed,
+        eval_size=args.eval_size,
+        eval_every=args.eval_every,
+        mixed_precision=args.mixed_precision,
+        deterministic=args.deterministic,
+    )